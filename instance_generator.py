@@ -369,36 +369,52 @@ class InstanceGenerator:
         Returns:
             List of Weighted bipartite Graphs with nodes 1 through n representing agents.
         """
-        matrix_list = util.unpack_r_data(s,n,k)
-        graph_list = []
+        return self.generate_list_from_array(util.unpack_r_data(s,n,k), normalization)
 
-        for i in range(matrix_list.shape[0]):
-            A = matrix_list[i]
-            M = []
 
-            for j in range(A.shape[0]):
-                d = {}
-                vals = np.random.rand(n)
+    def generate_list_from_array(self, prefs, normalization="unit_sum"):
+        """Generates a list of Graph objects based off of ordinal preferences that were already loaded, e.g. by util.unpack_r_data, normalized
+        to either unit-sum or unit-range. The valuations are drawn as in generate_valuations_from_array.
 
-                if normalization == "unit_range":
-                    val_max, val_min = np.max(vals), np.min(vals)
-                    vals = (vals - val_min)/(val_max - val_min)
-                else:
-                    vals = vals/np.sum(vals)
+        Args:
+            prefs (np.array): three-dimensional integer array of shape (k, n, n), where prefs[i][j] lists the ranks (1 through n) agent j of
+            trial i gives to each good.
+            normalization (str): whether or not the normalization should be unit-sum or unit range. Defaults to unit-sum.
 
-                vals.sort()
-                vals = np.flip(vals)
+        Returns:
+            List of Weighted bipartite Graphs with nodes 1 through n representing agents.
+        """
+        return [self.matrix_to_graph(M) for M in self.generate_valuations_from_array(prefs, normalization)]
 
-                for l in range(n):
-                    d[l+1] = vals[l]
 
-                M.append([d[item] for item in A[j]])               
+    def generate_valuations_from_array(self, prefs, normalization="unit_sum"):
+        """Generates the valuation matrices of k problem instances based off of ordinal preferences that were already loaded, e.g. by
+        util.unpack_r_data, normalized to either unit-sum or unit-range. Each agent draws n values uniformly at random and gives the largest to
+        its first choice, the second largest to its second choice, and so on.
 
-            M = np.array(M)
-            graph_list.append(self.matrix_to_graph(M))
+        Args:
+            prefs (np.array): three-dimensional integer array of shape (k, n, n), where prefs[i][j] lists the ranks (1 through n) agent j of
+            trial i gives to each good.
+            normalization (str): whether or not the normalization should be unit-sum or unit range. Defaults to unit-sum.
 
-            if self.logging:
+        Returns:
+            Three-dimensional numpy array of shape (k, n, n), where each row of each matrix represents agent preferences.
+        """
+        k, n, _ = prefs.shape
+        vals = np.random.rand(k, n, n)
+
+        if normalization == "unit_range":
+            val_max, val_min = np.max(vals, axis=2, keepdims=True), np.min(vals, axis=2, keepdims=True)
+            vals = (vals - val_min)/(val_max - val_min)
+        else:
+            vals = vals/np.sum(vals, axis=2, keepdims=True)
+
+        vals = np.flip(np.sort(vals, axis=2), axis=2)
+        matrices = np.take_along_axis(vals, prefs.astype(np.intp) - 1, axis=2)
+
+        if self.logging:
+            for M in matrices:
                 self.history[self.index] = M
                 self.index += 1
 
-        return graph_list
+        return matrices
@@ -7,13 +7,60 @@ visualization.
 """
 
 import argparse
+import functools
 import os
+import sys
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count, repeat
 
 import networkx as nx
+import numpy as np
 import pandas as pd
 
 import instance_generator
 import solver
+import util
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# the number of experiments run_one runs on each instance
+N_EXPERIMENTS = 5
+
+
+@functools.lru_cache(maxsize=None, typed=True)
+def _algo_label(name, *params):
+    """Builds the algo label of an experiment that is parametrized by e.g. epsilon or prio, such as 'epsilon_max_matching pareto0.1'. Labels
+    are cached and interned, so repeated experiments reuse the same string instead of formatting and concatenating a new one. Cached
+    per type, so that e.g. epsilon=1 and epsilon=1.0 still give the labels ending in '1' and '1.0'.
+
+    Args:
+        name (string): The start of the label.
+        params: The parameters of the experiment, appended to name in order.
+
+    Returns:
+        string label of the experiment.
+    """
+    return sys.intern(name + ''.join(map(str, params)))
+
+
+class Result(namedtuple('Result', 'val_index size valuation algo distortion')):
+    """The result of a single experiment, as returned by Simulator.rows and accepted by Simulator.extend.
+
+    Attributes:
+        val_index (int): The id of the valuation in the InstanceGenerator that created it.
+        size (int): The number of agents in the input.
+        valuation (string): The method by which the valuation was generated.
+        algo (string): The name of the algorithm that was run.
+        distortion (float): The distortion achieved by the algorithm.
+    """
+    __slots__ = ()
 
 
 class Simulator:
@@ -21,20 +68,120 @@ class Simulator:
 
     Attributes:
         instance_generator (InstanceGenerator): InstanceGenerator for creating problem instances for simulation
-        history (dict): history of all results, stored in a dictionary for later conversion to pd.DataFrame
+        history (dict): history of all results, stored as preallocated column arrays for later conversion to pd.DataFrame. Only the first
+        self._cursor rows of each column hold results.
     """
+    __slots__ = ('instance_generator', 'history', '_id_counter', '_cursor')
 
-    def __init__(self, instance_generate):
+    def __init__(self, instance_generate, n_rows=0):
         """Initializes a new Simulator.
 
         Args:
             instance_generate (InstanceGenerator): InstanceGenerator for creating problem instances for simulation
+            n_rows (int): The number of results to preallocate space for. Defaults to 0; more space is allocated as needed.
         """
         self.instance_generator = instance_generate
-        self.history = {'id': [], 'val_index': [], 'size': [], 'valuation':[], 'algo': [], 'distortion': []}
-        self.id = 1
+        self.history = {'id': np.empty(0, dtype=np.int32), 'val_index': np.empty(0, dtype=np.int32), 'size': np.empty(0, dtype=np.int32),
+                        'valuation': np.empty(0, dtype=object), 'algo': np.empty(0, dtype=object), 'distortion': np.empty(0, dtype=np.float64)}
+        self._id_counter = count(1)
+        self._cursor = 0
+        self.reserve(n_rows)
+
+    def reserve(self, n_rows):
+        """Makes sure self.history has room for at least n_rows more results, so logging an experiment writes into an existing slot
+        instead of growing a list. The columns at least double in size whenever they grow, so logging results a few at a time stays
+        linear overall.
+
+        Args:
+            n_rows (int): The number of results about to be logged.
+        """
+        needed = self._cursor + n_rows
+        capacity = len(self.history['id'])
+        if needed <= capacity:
+            return
+
+        new_capacity = max(needed, 2*capacity)
+        for key, column in self.history.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self._cursor] = column[:self._cursor]
+            self.history[key] = grown
+
+    def _record(self, val_index, size, val_type, algo_name, distortion):
+        """Logs the result of a single experiment in the next free row of self.history.
+
+        Args:
+            val_index (int): The id of the valuation in self.instance_generator.
+            size (int): The number of agents in the input.
+            val_type (string): The method by which the valuation was generated.
+            algo_name (string): The name of the algorithm that was run.
+            distortion (float): The distortion achieved by the algorithm.
+        """
+        h = self.history
+        i = self._cursor
+        if i == len(h['id']):
+            self.reserve(1)
+
+        h['id'][i] = next(self._id_counter)
+        h['val_index'][i] = val_index
+        h['size'][i] = size
+        h['valuation'][i] = val_type
+        h['algo'][i] = sys.intern(algo_name)
+        h['distortion'][i] = distortion
+        self._cursor = i + 1
+
+    def __len__(self):
+        """Returns the number of results logged so far."""
+        return self._cursor
+
+    def to_dataframe(self, start=0):
+        """Returns the results logged so far, starting from the start-th one.
+
+        Args:
+            start (int): The index of the first result to return. Defaults to 0.
+
+        Returns:
+            pd.DataFrame with one row per experiment, indexed by the order the results were logged in, with columns in the same order
+            as self.history.
+        """
+        return pd.DataFrame({key: column[start:self._cursor] for key, column in self.history.items()},
+                            index=pd.RangeIndex(start, self._cursor), copy=False)
 
-    def serial_dictatorship_experiment(self, val_index, val_type, G, size=None, agent_cap=None):
+    def rows(self):
+        """Returns all results logged so far, without their ids, so they can be merged into another Simulator.
+
+        Returns:
+            list of Results, in the order they were logged.
+        """
+        h = self.history
+        n = self._cursor
+        return list(map(Result._make, zip(h['val_index'][:n], h['size'][:n], h['valuation'][:n], h['algo'][:n], h['distortion'][:n])))
+
+    def extend(self, rows):
+        """Logs results produced elsewhere (e.g. by Simulator.rows in a worker process), assigning them the next ids of this Simulator.
+
+        Args:
+            rows (list): list of Results, or of (val_index, size, valuation, algo, distortion) tuples.
+        """
+        self.reserve(len(rows))
+
+        h = self.history
+        ids, val_indices, sizes, valuations, algos, distortions = (h['id'], h['val_index'], h['size'], h['valuation'], h['algo'],
+                                                                   h['distortion'])
+        next_id = self._id_counter.__next__
+        intern = sys.intern
+
+        i = self._cursor
+        for val_index, size, val_type, algo_name, distortion in rows:
+            ids[i] = next_id()
+            val_indices[i] = val_index
+            sizes[i] = size
+            valuations[i] = val_type
+            algos[i] = intern(algo_name)
+            distortions[i] = distortion
+            i += 1
+        self._cursor = i
+
+    def serial_dictatorship_experiment(self, val_index, val_type, G, size=None, agent_cap=None, ctx=None):
         """Finds the distortion of running serial dictatorship on the given input.
         
         Args:
@@ -43,22 +190,17 @@ class Simulator:
             G (nx.Graph): The actual matching input. Must be a weighted bipartite graph with numerical node labels.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to skip ranking G and to speed up the distortion calculation.
             
         """
         if size is None:
             size = len(G.nodes)//2
 
-        M = solver.serial_dictatorship(G,agent_cap)
+        M = solver.serial_dictatorship(G,agent_cap,ctx is None)
 
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('serial_dictatorship')
-        self.history['distortion'].append(solver.calculate_modified_distortion(G,M,prio='pareto'))
+        self._record(val_index, size, val_type, 'serial_dictatorship', solver.calculate_modified_distortion_pareto(G,M,ctx))
 
-    def partial_max_matching_experiment(self, val_index, val_type, G, m, size=None, agent_cap=None):
+    def partial_max_matching_experiment(self, val_index, val_type, G, m, size=None, agent_cap=None, ctx=None):
         """Finds the distortion of running PartialMaxMatching on the given input.
         
         Args:
@@ -68,24 +210,18 @@ class Simulator:
             m (int): The number of buckets, used as input to PartialMaxMatching.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to speed up the distortion calculation.
             
         """
         if size is None:
             size = len(G.nodes)//2
 
         M = solver.partial_max_matching(G,m,agent_cap)
-        H = solver.reassign_labels(G, M)
-        M_0 = solver.top_trading_cycles(H)
-
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('partial_max_matching' + '_' + str(m))
-        self.history['distortion'].append(solver.calculate_distortion(G, M_0))
-
-    def modified_max_matching_experiment(self, val_index, val_type, G, prio='pareto', size=None, agent_cap=None):
+        M_0 = solver.top_trading_cycles(G, agent_cap, set([(a,b) if a < b else (b,a) for (a,b) in M]))
+
+        self._record(val_index, size, val_type, _algo_label('partial_max_matching_', m), solver.calculate_distortion(G, M_0, ctx))
+
+    def modified_max_matching_experiment(self, val_index, val_type, G, prio='pareto', size=None, agent_cap=None, ctx=None):
         """Finds the distortion of running ModifiedMaxMatching on the given input.
         
         Args:
@@ -94,22 +230,17 @@ class Simulator:
             G (nx.Graph): The actual matching input. Must be a weighted bipartite graph with numerical node labels.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to skip ranking G and to speed up the distortion calculation.
             
         """
         if size is None:
             size = len(G.nodes)//2
 
-        M_0 = solver.modified_max_matching(G,prio=prio,agent_cap=agent_cap)
+        M_0 = solver.modified_max_matching(G,prio=prio,agent_cap=agent_cap,need_ranks=ctx is None)
 
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('modified_max_matching')
-        self.history['distortion'].append(solver.calculate_modified_distortion(G,M_0,prio))
+        self._record(val_index, size, val_type, 'modified_max_matching', solver.calculate_modified_distortion(G,M_0,prio,agent_cap,ctx))
 
-    def top_trading_cycles_experiment(self, val_index, val_type, G, size=None, agent_cap=None):
+    def top_trading_cycles_experiment(self, val_index, val_type, G, size=None, agent_cap=None, ctx=None):
         """Finds the distortion of running top trading cycles on the given input.
         
         Args:
@@ -118,21 +249,16 @@ class Simulator:
             G (nx.Graph): The actual matching input. Must be a weighted bipartite graph with numerical node labels.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to speed up the distortion calculation.
         """
         if size is None:
             size = len(G.nodes)//2
 
         M = solver.top_trading_cycles(G,agent_cap)
 
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('ttc_matching')
-        self.history['distortion'].append(solver.calculate_modified_distortion(G,M,prio='pareto'))
+        self._record(val_index, size, val_type, 'ttc_matching', solver.calculate_modified_distortion_pareto(G,M,ctx))
     
-    def epsilon_max_matching_experiment(self, val_index, val_type, G, epsilon, size=None, agent_cap=None):
+    def epsilon_max_matching_experiment(self, val_index, val_type, G, epsilon, size=None, agent_cap=None, ctx=None):
         """Finds the distortion of running epsilon max matching on the given input.
         
         Args:
@@ -141,23 +267,16 @@ class Simulator:
             G (nx.Graph): The actual matching input. Must be a weighted bipartite graph with numerical node labels.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to skip ranking G and to speed up the distortion calculation.
         """
         if size is None:
             size = len(G.nodes)//2
 
-        M = solver.epsilon_max_matching(G, epsilon, agent_cap=agent_cap)
-        H = solver.reassign_labels(G, M)
-        M_0 = solver.top_trading_cycles(H)
+        M = solver.epsilon_max_matching(G, epsilon, agent_cap=agent_cap, need_ranks=ctx is None) # already Pareto optimal by TTC
 
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('epsilon_max_matching'+str(epsilon))
-        self.history['distortion'].append(solver.calculate_distortion(G,M_0))
+        self._record(val_index, size, val_type, _algo_label('epsilon_max_matching', epsilon), solver.calculate_distortion(G, M, ctx))
 
-    def epsilon_max_matching_prio_experiment(self, val_index, val_type, G, epsilon, prio='pareto', size=None, agent_cap=None):
+    def epsilon_max_matching_prio_experiment(self, val_index, val_type, G, epsilon, prio='pareto', size=None, agent_cap=None, ctx=None):
         """Finds the distortion of running epsilon max matching on the given input.
         
         Args:
@@ -167,22 +286,17 @@ class Simulator:
             prio (String): String in ['rank_maximal', 'max_cardinality_rank_maximal', 'fair'] that represents the priority vector used for this problem. Defaults to 'rank_maximal'.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to skip ranking G and to speed up the distortion calculation.
         """
         if size is None:
             size = len(G.nodes)//2
 
-        M = solver.epsilon_max_matching(G, epsilon, prio, agent_cap)
+        M = solver.epsilon_max_matching(G, epsilon, prio, agent_cap, ctx is None)
 
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('epsilon_max_matching '+prio+str(epsilon))
-        self.history['distortion'].append(solver.calculate_modified_distortion(G,M,prio))
+        self._record(val_index, size, val_type, _algo_label('epsilon_max_matching ', prio, epsilon), solver.calculate_modified_distortion(G,M,prio,agent_cap,ctx))
 
     # TODO fix inconsistent casing
-    def twothirds_max_matching_experiment(self, val_index, val_type, G, prio, size=None, agent_cap=None):
+    def twothirds_max_matching_experiment(self, val_index, val_type, G, prio, size=None, agent_cap=None, ctx=None):
         """Finds the distortion of twothirds_max_matching on the given input.
         
         Args:
@@ -192,18 +306,16 @@ class Simulator:
             prio (String): String in ['rank_maximal', 'max_cardinality_rank_maximal', 'fair'] that represents the priority vector used for this problem. Defaults to 'rank_maximal'.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to skip ranking G and to speed up the distortion calculation.
         """
-        M = solver.twothirds_max_matching(G, prio, agent_cap)
+        if size is None:
+            size = len(G.nodes)//2
 
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('twothirds_max_matching '+prio)
-        self.history['distortion'].append(solver.calculate_modified_distortion(G,M,prio))
+        M = solver.twothirds_max_matching(G, prio, agent_cap, ctx is None)
 
-    def updated_hybrid_max_matching_experiment(self, val_index, val_type, G, size=None, agent_cap=None):
+        self._record(val_index, size, val_type, _algo_label('twothirds_max_matching ', prio), solver.calculate_modified_distortion(G,M,prio,agent_cap,ctx))
+
+    def updated_hybrid_max_matching_experiment(self, val_index, val_type, G, size=None, agent_cap=None, ctx=None):
         """Finds the distortion of running updated HybridMaxMatching on the given input.
         
         Args:
@@ -212,22 +324,221 @@ class Simulator:
             G (nx.Graph): The actual matching input. Must be a weighted bipartite graph with numerical node labels.
             size (int): The number of agents in the input. Defaults to half the size of G.nodes if not given.
             agent_cap (int): An integer value i such that for all nodes with label <= i, those nodes are agents. Defaults to len(G.nodes//2) if not given.
+            ctx (GraphCtx): The GraphCtx of G from solver.make_graph_ctx. If given, it is used to skip ranking G and to speed up the distortion calculation.
             
         """
         if size is None:
             size = len(G.nodes)//2
 
-        M = solver.updated_hybrid_max_matching(G,agent_cap=agent_cap)
-        H = solver.reassign_labels(G, M)
-        M_0 = solver.top_trading_cycles(H)
+        M = solver.updated_hybrid_max_matching(G,agent_cap=agent_cap,need_ranks=ctx is None) # already Pareto optimal by TTC
+
+        self._record(val_index, size, val_type, 'updated_hybrid_max_matching', solver.calculate_modified_distortion_pareto(G,M,ctx))
+
+
+class ParquetResultWriter:
+    """Streams the results logged by a Simulator to a Parquet file in batches while the simulation runs, instead of writing them all out
+    at the end. Requires pyarrow.
+
+    Attributes:
+        writer (pq.ParquetWriter): The writer for the Parquet file.
+        batch_size (int): The number of new results to wait for before writing them out.
+        written (int): The number of results of the Simulator already written to the file.
+    """
+
+    SCHEMA = None if pa is None else pa.schema([('id', pa.int32()), ('val_index', pa.int32()), ('size', pa.int32()),
+                                                 ('valuation', pa.dictionary(pa.int32(), pa.string())),
+                                                 ('algo', pa.dictionary(pa.int32(), pa.string())), ('distortion', pa.float64())])
+
+    def __init__(self, path, batch_size=256):
+        """Initializes a new ParquetResultWriter.
+
+        Args:
+            path (str): The path of the Parquet file to write to.
+            batch_size (int): The number of new results to wait for before writing them out. Defaults to 256.
+        """
+        self.writer = pq.ParquetWriter(path, self.SCHEMA)
+        self.batch_size = batch_size
+        self.written = 0
+
+    def write(self, sim, force=False):
+        """Writes out the results sim has logged since the last write, if there are at least self.batch_size of them.
+
+        Args:
+            sim (Simulator): The Simulator whose results are being written.
+            force (bool): Whether to write out the new results even if there are fewer than self.batch_size of them. Defaults to False.
+        """
+        pending = len(sim) - self.written
+        if pending == 0 or (pending < self.batch_size and not force):
+            return
+
+        columns = [sim.history[field.name][self.written:len(sim)] for field in self.SCHEMA]
+        arrays = [pa.array(column, pa.string()).dictionary_encode() if pa.types.is_dictionary(field.type) else pa.array(column, field.type)
+                  for field, column in zip(self.SCHEMA, columns)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.SCHEMA))
+        self.written = len(sim)
+
+    def close(self, sim):
+        """Writes out any remaining results of sim and closes the file.
+
+        Args:
+            sim (Simulator): The Simulator whose results are being written.
+        """
+        self.write(sim, force=True)
+        self.writer.close()
+
+
+class CsvResultWriter:
+    """Appends the results logged by a Simulator to a CSV file in batches while the simulation runs, so that a long run that dies keeps what
+    it has logged so far and the file can be read before the run ends. The file has the same columns as sim.to_dataframe().to_csv(path).
+    Uses pyarrow's CSV writer, which encodes the columns of sim.history directly, if pyarrow is installed, and pandas otherwise.
+
+    Attributes:
+        file (file object): The CSV file, open for writing.
+        batch_size (int): The number of new results to wait for before writing them out.
+        written (int): The number of results of the Simulator already written to the file.
+    """
+
+    def __init__(self, path, batch_size=100):
+        """Initializes a new CsvResultWriter. Any existing file at path is overwritten.
+
+        Args:
+            path (str): The path of the CSV file to write to.
+            batch_size (int): The number of new results to wait for before writing them out. Defaults to 100.
+        """
+        self.file = open(path, 'wb') if pa is not None else open(path, 'w', newline='')
+        self.batch_size = batch_size
+        self.written = 0
+        self._writer = None
+
+    def write(self, sim, force=False):
+        """Appends the results sim has logged since the last write, if there are at least self.batch_size of them, and syncs them to disk.
+
+        Args:
+            sim (Simulator): The Simulator whose results are being written.
+            force (bool): Whether to write out the new results even if there are fewer than self.batch_size of them. Defaults to False.
+        """
+        pending = len(sim) - self.written
+        if pending == 0 or (pending < self.batch_size and not force):
+            return
+
+        self._append(sim)
+
+    def _append(self, sim):
+        """Appends all results of sim that haven't been written yet, with the header line if nothing has been written before, and syncs
+        them to disk.
+
+        Args:
+            sim (Simulator): The Simulator whose results are being written.
+        """
+        if pa is None:
+            sim.to_dataframe(self.written).to_csv(self.file, header=(self.written == 0))
+        else:
+            n = len(sim)
+            table = pa.table({'': np.arange(self.written, n), **{key: column[self.written:n] for key, column in sim.history.items()}})
+            if self._writer is None:
+                self._writer = pacsv.CSVWriter(self.file, table.schema)
+            self._writer.write_table(table)
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.written = len(sim)
+
+    def close(self, sim):
+        """Writes out any remaining results of sim and closes the file.
+
+        Args:
+            sim (Simulator): The Simulator whose results are being written.
+        """
+        self.write(sim, force=True)
+        if self.written == 0: # no results at all, but the file still gets its header line
+            self._append(sim)
+        if self._writer is not None:
+            self._writer.close()
+        self.file.close()
+
 
-        self.history['id'].append(self.id)
-        self.id += 1
-        self.history['val_index'].append(val_index)
-        self.history['size'].append(size)
-        self.history['valuation'].append(val_type)
-        self.history['algo'].append('updated_hybrid_max_matching')
-        self.history['distortion'].append(solver.calculate_modified_distortion(G,M_0,prio='pareto'))
+def run_one(G, val_index, val_type):
+    """Runs every experiment of the simulation on a single problem instance. Kept at module level so it can be sent to worker processes.
+    Assigns ranks to the edges of G in place (see solver.make_graph_ctx).
+
+    Args:
+        G (nx.Graph): The actual matching input. Must be a weighted bipartite graph with numerical node labels.
+        val_index (int): The id of the valuation in the InstanceGenerator that created G.
+        val_type (string): The method by which the valuation was generated.
+
+    Returns:
+        list of Results, one per experiment, in the order they were run.
+    """
+    sim = Simulator(None, N_EXPERIMENTS)
+    agent_cap = G.number_of_nodes()//2
+    ctx = solver.make_graph_ctx(G, agent_cap) # ranks the edges of G in place, so G is modified for the caller too
+
+    # adjust experiments here, and N_EXPERIMENTS with them
+    sim.serial_dictatorship_experiment(val_index, val_type, G, size=agent_cap, agent_cap=agent_cap, ctx=ctx)
+    sim.top_trading_cycles_experiment(val_index, val_type, G, size=agent_cap, agent_cap=agent_cap, ctx=ctx)
+    sim.epsilon_max_matching_prio_experiment(val_index, val_type, G, 1, prio='pareto', size=agent_cap, agent_cap=agent_cap, ctx=ctx)
+    sim.epsilon_max_matching_prio_experiment(val_index, val_type, G, 0.1, prio='pareto', size=agent_cap, agent_cap=agent_cap, ctx=ctx)
+    sim.updated_hybrid_max_matching_experiment(val_index, val_type, G, size=agent_cap, agent_cap=agent_cap, ctx=ctx)
+
+    return sim.rows()
+
+
+def run_one_shared(path, i, val_index, val_type):
+    """Runs run_one on the i-th problem instance saved by run_batch. The file is memory-mapped, so worker processes read the valuations from
+    shared pages instead of each being sent a pickled Graph.
+
+    Args:
+        path (str): The path of the .npy file holding the valuation matrices of all instances of the batch.
+        i (int): The position of the instance in the batch.
+        val_index (int): The id of the valuation in the InstanceGenerator that created it.
+        val_type (string): The method by which the valuation was generated.
+
+    Returns:
+        list of Results, one per experiment, in the order they were run.
+    """
+    valuations = np.load(path, mmap_mode='r')
+    G = instance_generator.InstanceGenerator().matrix_to_graph(np.asarray(valuations[i]))
+    return run_one(G, val_index, val_type)
+
+
+def run_batch(sim, valuations, val_indices, val_type, executor=None, writer=None):
+    """Runs run_one on the problem instance of every valuation matrix in valuations and logs the results in sim, in the order of valuations.
+
+    Args:
+        sim (Simulator): The Simulator to log the results in.
+        valuations (np.array): three-dimensional array of shape (k, n, n) holding the valuation matrix of each instance, as returned by
+        InstanceGenerator.generate_valuations_from_array.
+        val_indices (np.array): The id of the valuation of each instance in the InstanceGenerator that created it.
+        val_type (string): The method by which the valuations were generated.
+        executor (concurrent.futures.Executor): The executor to run the instances on. If not given, they are run one by one in this process.
+        writer (ParquetResultWriter or CsvResultWriter): A writer to stream the results to as they come in, if any.
+    """
+    sim.reserve(N_EXPERIMENTS*len(valuations))
+
+    if executor is None:
+        graphs = map(instance_generator.InstanceGenerator().matrix_to_graph, valuations)
+        log_results(sim, map(run_one, graphs, val_indices, repeat(val_type)), writer)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "valuations.npy")
+        np.save(path, valuations)
+        log_results(sim, executor.map(run_one_shared, repeat(path), range(len(valuations)), val_indices, repeat(val_type), chunksize=8), writer)
+
+
+def log_results(sim, results, writer=None):
+    """Logs the results of run_one for a sequence of instances in sim as they come in.
+
+    Args:
+        sim (Simulator): The Simulator to log the results in.
+        results (iterable): The lists of Results returned by run_one, one per instance.
+        writer (ParquetResultWriter or CsvResultWriter): A writer to stream the results to as they come in, if any.
+    """
+    extend = sim.extend
+    for rows in results:
+        extend(rows)
+        if writer is not None:
+            writer.write(sim)
 
 
 if __name__ == '__main__':
@@ -239,40 +550,41 @@ if __name__ == '__main__':
     parser.add_argument("--norm", type=str, default="range", choices=["range", "sum"])
     parser.add_argument("--save_dir", type=str, default="./")
     parser.add_argument("--ckpt_path", type=str, default="./")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--format", type=str, default="csv", choices=["csv", "parquet"])
+    parser.add_argument("--matching-backend", type=str, default="networkx", choices=solver.MATCHING_BACKENDS)
 
     args = parser.parse_args()
+    if args.format == "parquet" and pa is None:
+        parser.error("--format parquet requires pyarrow")
+    if args.matching_backend == "rustworkx" and solver.rx is None:
+        parser.error("--matching-backend rustworkx requires rustworkx")
+    solver.set_matching_backend(args.matching_backend)
 
     val_type = f"theta{args.scale}unit{args.norm}"
 
-    for size in [5, 10, 20, 50, 100]:
-        filename = f"rdata/ord_n{size}_theta{args.scale}.txt"
-        print('current n value is', size)
-
-        G_list = instantiator.generate_list_from_ordinal_preferences(filename, size, 100, f"unit_{args.norm}")
-        val_index = instantiator.index - 100
-
-        for i in range(len(G_list)):
-            G = G_list[i]
-
-            # adjust experiments here
-            sim.serial_dictatorship_experiment(val_index, val_type, G)
-            sim.top_trading_cycles_experiment(val_index, val_type, G)
-            sim.epsilon_max_matching_prio_experiment(val_index, val_type, G, 1, prio='pareto')
-            sim.epsilon_max_matching_prio_experiment(val_index, val_type, G, 0.1, prio='pareto')
-            sim.updated_hybrid_max_matching_experiment(val_index, val_type, G)
-
-            val_index += 1
-
     # adjust naming conventions here
     data_dir = os.path.join(args.save_dir, "ijcaidata")
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
 
-    s = os.path.join(data_dir, val_type + ".csv")
+    s = os.path.join(data_dir, val_type + "." + args.format)
     s_instances = os.path.join(data_dir, val_type + "instances.csv")
 
-    df = pd.DataFrame(sim.history)
-    df.to_csv(s)
+    writer = ParquetResultWriter(s) if args.format == "parquet" else CsvResultWriter(s)
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=solver.set_matching_backend, initargs=(args.matching_backend,)) as executor:
+        for size in [5, 10, 20, 50, 100]:
+            filename = f"rdata/ord_n{size}_theta{args.scale}.txt"
+            print('current n value is', size)
+
+            prefs = util.unpack_r_data(filename, size, 100)
+            valuations = instantiator.generate_valuations_from_array(prefs, f"unit_{args.norm}")
+            val_indices = np.arange(instantiator.index - len(valuations), instantiator.index, dtype=np.int32)
+
+            run_batch(sim, valuations, val_indices, val_type, executor, writer)
+
+    writer.close(sim)
 
     df = pd.Series(sim.instance_generator.history)
     df.to_csv(s_instances)
@@ -1,8 +1,88 @@
 """Module containing methods to compute matchings and calculate distortion."""
 
+import functools
+from dataclasses import dataclass
+
 import networkx as nx
 import numpy as np
 import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+try:
+    import rustworkx as rx
+except ImportError:
+    rx = None
+
+MATCHING_BACKENDS = ('networkx', 'rustworkx')
+_matching_backend = 'networkx'
+# rustworkx matches on integer weights, summed in 128-bit integers; keep well clear of overflow
+_RX_MAX_WEIGHT = 2**100
+
+
+def set_matching_backend(backend):
+    """Selects the library max_weight_matching uses. rustworkx is faster, but when several matchings have the maximum weight it may return a
+    different one than networkx, which changes the distortions of some instances, so networkx stays the default.
+
+    Args:
+        backend (str): One of MATCHING_BACKENDS. 'rustworkx' requires rustworkx to be installed.
+    """
+    global _matching_backend
+
+    if backend not in MATCHING_BACKENDS:
+        raise ValueError(f"unknown matching backend {backend!r}, expected one of {MATCHING_BACKENDS}")
+    if backend == 'rustworkx' and rx is None:
+        raise ValueError("the rustworkx matching backend requires rustworkx")
+    _matching_backend = backend
+
+
+def integer_weights(G):
+    """Scales the weights of the edges of G to integers by a common power of two, which is exact since every float is a dyadic rational.
+    Scaling all weights by the same positive factor leaves the maximum weight matchings of G unchanged.
+
+    Args:
+        G (nx.Graph): Weighted Graph. Edges without a weight count as weight 1, as in nx.algorithms.matching.max_weight_matching.
+
+    Returns:
+        list of ints holding the scaled weight of each edge in the order of G.edges, or None if some weight isn't finite or the scaled weights
+        are too large for rustworkx.
+    """
+    try:
+        ratios = [float(weight).as_integer_ratio() for (u,v,weight) in G.edges(data='weight', default=1)]
+    except (OverflowError, ValueError): # inf or nan
+        return None
+
+    scale = max([denominator for (numerator, denominator) in ratios], default=1)
+    weights = [numerator*(scale//denominator) for (numerator, denominator) in ratios]
+
+    if max(map(abs, weights), default=0) >= _RX_MAX_WEIGHT:
+        return None
+    return weights
+
+
+def max_weight_matching(G, maxcardinality=False):
+    """Computes a maximum weight matching of G, as nx.algorithms.matching.max_weight_matching does. If the rustworkx backend was selected with
+    set_matching_backend and the weights of G can be scaled exactly to integers it can handle (see integer_weights), the matching is computed
+    by rustworkx's compiled implementation.
+
+    Args:
+        G (nx.Graph): Weighted Graph.
+        maxcardinality (bool): If True, compute the maximum weight matching among all maximum cardinality matchings. Defaults to False.
+
+    Returns:
+        set((nx.Node,nx.Node)) of 2-tuples, with each 2-tuple representing a matched edge of G.
+    """
+    weights = integer_weights(G) if _matching_backend == 'rustworkx' else None
+    if weights is None:
+        return nx.algorithms.matching.max_weight_matching(G, maxcardinality)
+
+    nodes = list(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    R = rx.PyGraph()
+    R.add_nodes_from(nodes)
+    R.add_edges_from([(index[u], index[v], weight) for ((u,v), weight) in zip(G.edges, weights)])
+
+    match = rx.max_weight_matching(R, max_cardinality=maxcardinality, weight_fn=int)
+    return set([(nodes[a], nodes[b]) for (a,b) in match])
 
 
 def rankify_graph(G, agent_cap=None):
@@ -32,7 +112,7 @@ def rankify_graph(G, agent_cap=None):
     return G
 
 
-def priority_augment(G, prio='pareto', agent_cap=None):
+def priority_augment(G, prio='pareto', agent_cap=None, need_ranks=True):
     """Augments a weighted bipartite graph G to generate a new weighted biparitite graph H, such that G and H have identical vertices,
     but solving the maximum weight matching problem on H will yield a matching in G that is maximum weight subject to either pareto optimality, rank maximality,
     max-cardinality rank maximality, or fairness. The augmentation is based on the paper associated with this experiment.
@@ -44,6 +124,8 @@ def priority_augment(G, prio='pareto', agent_cap=None):
         the new Graph should have. If none of these options are given, rank-maximal will be assumed.
         agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is equal to i. Defaults
         to len(G.nodes)//2 if not given.
+        need_ranks (bool): whether or not ranks still have to be assigned to the edges of G. Pass False if G has already been through rankify_graph,
+        e.g. by make_graph_ctx. Defaults to True.
 
     Returns:
         H (nx.Graph): Weighted bipartite Graph with nodes named 1 through n and positive weights on each edge, augmented with the rank of each edge.
@@ -53,7 +135,8 @@ def priority_augment(G, prio='pareto', agent_cap=None):
 
     H = G.copy()
     n = agent_cap
-    H = rankify_graph(H, agent_cap = agent_cap)
+    if need_ranks:
+        H = rankify_graph(H, agent_cap = agent_cap)
 
     for (u,v) in H.edges:
         r = H[u][v]['rank']
@@ -246,7 +329,7 @@ def partial_max_matching(G, m, agent_cap=None):
         if new_weight != 0:
             H.add_weighted_edges_from([(u,v, new_weight)])
 
-    first_matching = nx.algorithms.matching.max_weight_matching(H)
+    first_matching = max_weight_matching(H)
 
     if sum([[u,v] for (u,v) in first_matching], []) == len(G.nodes):
         return first_matching
@@ -261,7 +344,7 @@ def partial_max_matching(G, m, agent_cap=None):
 
 
 #TODO modify this to include priority-p
-def modified_max_matching(G,prio='pareto',agent_cap=None):
+def modified_max_matching(G,prio='pareto',agent_cap=None,need_ranks=True):
     """Runs the ModifiedMaxMatching algorithm on a weighted bipartite Graph G that has been normalized to unit-range; that is, each agent's most valued good
     must have a value of 1. Assumes the nodes of G are enumerated from 1 to n.
 
@@ -269,6 +352,8 @@ def modified_max_matching(G,prio='pareto',agent_cap=None):
         G (nx.Graph): Weighted bipartite Graph, with all edge weights assumed to be in [0,1], and each agent's most preferred good has a value of 1.
         agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is equal to i. Defaults
         to len(G.nodes)//2 if not given.
+        need_ranks (bool): whether or not ranks still have to be assigned to the edges of G. Pass False if G has already been through rankify_graph,
+        e.g. by make_graph_ctx. Defaults to True.
 
     Returns:
         A set of 2-tuples representing a matching on G found by ModifiedMaxMatching.
@@ -288,8 +373,7 @@ def modified_max_matching(G,prio='pareto',agent_cap=None):
         else:
             H.add_weighted_edges_from([(u,v,0)])
 
-    I = G.copy()
-    I = rankify_graph(I)
+    I = rankify_graph(G.copy(), agent_cap) if need_ranks else G
 
     for (u,v) in H.edges:
         r = I[u][v]['rank']
@@ -300,7 +384,7 @@ def modified_max_matching(G,prio='pareto',agent_cap=None):
         elif prio=='rank_maximal':
             H[u][v]['weight'] += np.power(n,2*(n-r+1))
 
-    first_matching = nx.algorithms.matching.max_weight_matching(H)
+    first_matching = max_weight_matching(H)
 
     I = G.copy()
     I.remove_nodes_from(sum([[u,v] for (u,v) in first_matching], []))
@@ -400,28 +484,67 @@ def top_trading_cycles(G, agent_cap=None, initial_matching=None):
     return M
 
 
-def compute_epsilon_bucket(x,n,epsilon):
-    """Helper function which computes which bucket of (2/2+epsilon)^i x should be rounded to, given n agents. x must be in [0,1]; if x
-    is too small to be bucketed, -1 will be returned instead.
-    
+@functools.lru_cache(maxsize=None)
+def make_epsilon_matcher(epsilon):
+    """Specializes epsilon_max_matching to a fixed epsilon. Edge values x >= (2/(2+epsilon))^ceil(log(n^2/epsilon)/log(1+epsilon/2)) are
+    rounded down to a power of 2/(2+epsilon), and smaller values are replaced by a tiny positive weight. The quantities this rounding
+    derives from epsilon (and from the number of agents n) are computed once here instead of once per edge. Matchers are cached, so each
+    distinct epsilon is only specialized once.
+
     Args:
-        x (float): Edge value in [0,1].
-        n (int): Number of agents.
-        epsilon (float): epsilon where (1+epsilon) is the approximation ratio.
-        
+        epsilon (float): the approximation ratio we wish to achieve; this algorithm guarantees a 1+epsilon approximation.
+
     Returns:
-        float approximation of x according to the buckets."""
+        A function matcher(G, prio='pareto', agent_cap=None, need_ranks=True) equivalent to epsilon_max_matching(G, epsilon, prio, agent_cap, need_ranks).
+    """
+    ratio = 2/(2+epsilon)
+    log_ratio = np.log(ratio)
+    log_step = np.log(1+epsilon/2)
+    tiny = np.finfo(float).eps
+    thresholds = {}
 
-    cap = np.ceil(np.log(n**2/epsilon)/np.log(1+epsilon/2))
-    threshold = np.power(2/(2+epsilon), cap)
+    def matcher(G, prio='pareto', agent_cap=None, need_ranks=True):
+        if agent_cap is None: # note in instances where nodes MUST be labelled 1...n, agent_cap=|agents|
+            agent_cap = len(G.nodes)//2
 
-    if x < threshold:
-        return -1
-    else:
-        return np.ceil(np.log(x)/np.log(2/(2+epsilon)))
+        H = nx.Graph()
+        H.add_nodes_from(G.nodes)
+        n = agent_cap
+
+        if n not in thresholds:
+            thresholds[n] = np.power(ratio, np.ceil(np.log(n**2/epsilon)/log_step))
+        threshold = thresholds[n]
 
+        for (u,v) in G.edges:
+            x = G[u][v]['weight']
 
-def epsilon_max_matching(G, epsilon, prio='pareto', agent_cap=None):
+            if x >= threshold:
+                H.add_weighted_edges_from([(u,v, np.power(ratio, np.ceil(np.log(x)/log_ratio)))])
+            else:
+                H.add_weighted_edges_from([(u,v,tiny)]) #hack to still include this edge in matching
+
+        I = rankify_graph(G.copy(), agent_cap) if need_ranks else G
+
+        for (u,v) in H.edges:
+            r = I[u][v]['rank']
+            if prio=='fair':
+                H[u][v]['weight'] += 4*np.power(n,2*n) - 2*np.power(n,r-1)
+            elif prio=='max_cardinality_rank_maximal':
+                H[u][v]['weight'] += np.power(n,2*n) + np.power(n,2*(n-r))
+            elif prio=='rank_maximal':
+                H[u][v]['weight'] += np.power(n,2*(n-r+1))
+
+        match = max_weight_matching(H) # this technically should be TTC'ed afterwards
+        match = set([(a,b) if a < b else (b,a) for (a,b) in match])
+        if prio=='pareto':
+            return top_trading_cycles(G,agent_cap,match)
+        else:
+            return match
+
+    return matcher
+
+
+def epsilon_max_matching(G, epsilon, prio='pareto', agent_cap=None, need_ranks=True):
     """Runs Algorithm 2 from the write-up on weighted bipartite Graph G.
     
     Args:
@@ -430,46 +553,16 @@ def epsilon_max_matching(G, epsilon, prio='pareto', agent_cap=None):
         prio (String): String in ['pareto', 'rank_maximal', 'max_cardinality_rank_maximal', 'fair'] that represents the priority vector used for this problem. Defaults to 'rank_maximal'.
         agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is 
         equal to i. Defaults to len(G.nodes)//2 if not given.
+        need_ranks (bool): whether or not ranks still have to be assigned to the edges of G. Pass False if G has already been through rankify_graph,
+        e.g. by make_graph_ctx. Defaults to True.
 
     Returns:
         A set of 2-tuples representing a matching on G found by HybridMaxMatching.  
     """
-    if agent_cap is None: # note in instances where nodes MUST be labelled 1...n, agent_cap=|agents|
-        agent_cap = len(G.nodes)//2
+    return make_epsilon_matcher(epsilon)(G, prio, agent_cap, need_ranks)
 
-    H = nx.Graph()
-    H.add_nodes_from(G.nodes)
-    n = agent_cap
 
-    for (u,v) in G.edges:
-        new_weight = compute_epsilon_bucket(G[u][v]['weight'], agent_cap, epsilon)
-
-        if new_weight != -1:        
-            H.add_weighted_edges_from([(u,v, np.power((2/(2+epsilon)),new_weight))])
-        else:
-            H.add_weighted_edges_from([(u,v,np.finfo(np.float).eps)]) #hack to still include this edge in matching
-
-    I = G.copy()
-    I = rankify_graph(I)
-
-    for (u,v) in H.edges:
-        r = I[u][v]['rank']
-        if prio=='fair':
-            H[u][v]['weight'] += 4*np.power(n,2*n) - 2*np.power(n,r-1)
-        elif prio=='max_cardinality_rank_maximal':
-            H[u][v]['weight'] += np.power(n,2*n) + np.power(n,2*(n-r))
-        elif prio=='rank_maximal':
-            H[u][v]['weight'] += np.power(n,2*(n-r+1))
-
-    match = nx.algorithms.matching.max_weight_matching(H) # this technically should be TTC'ed afterwards
-    match = set([(a,b) if a < b else (b,a) for (a,b) in match])
-    if prio=='pareto':
-        return top_trading_cycles(G,agent_cap,match)
-    else:
-        return match
-
-
-def twothirds_max_matching(G,prio='rank_maximal',agent_cap=None):
+def twothirds_max_matching(G,prio='rank_maximal',agent_cap=None,need_ranks=True):
     """Given a weighted bipartite Graph G and a priority prio, returns a priority-prio matching that is an O(n^2/3) approximation to the welfare-optimal
     priority-prio matching. Equivalent to Algorithm 3 in the final write-up.
     
@@ -478,6 +571,8 @@ def twothirds_max_matching(G,prio='rank_maximal',agent_cap=None):
         prio (String): String in ['rank_maximal', 'max_cardinality_rank_maximal', 'fair'] that represents the priority vector used for this problem. Defaults to 'rank_maximal'.
         agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is 
         equal to i. Defaults to len(G.nodes)//2 if not given.
+        need_ranks (bool): whether or not ranks still have to be assigned to the edges of G. Pass False if G has already been through rankify_graph,
+        e.g. by make_graph_ctx. Defaults to True.
 
     Returns:
         A set of 2-tuples representing a matching on G.
@@ -486,7 +581,8 @@ def twothirds_max_matching(G,prio='rank_maximal',agent_cap=None):
         agent_cap = len(G.nodes)//2
 
     H = G.copy()
-    H = rankify_graph(H)
+    if need_ranks:
+        H = rankify_graph(H, agent_cap)
     n = agent_cap
 
     for (u,v) in H.edges:
@@ -504,11 +600,11 @@ def twothirds_max_matching(G,prio='rank_maximal',agent_cap=None):
         else:
             H[u][v]['weight'] += np.power(n,2*(n-r+1))
 
-    return nx.algorithms.matching.max_weight_matching(H)
+    return max_weight_matching(H)
         
 
 #TODO this is super messy, try to clean this up if you have time
-def updated_hybrid_max_matching(G, agent_cap=None):
+def updated_hybrid_max_matching(G, agent_cap=None, need_ranks=True):
     """Runs the Algorithm 4 (an updated version of hybridMaxMatching) from the write-up on a weighted bipartite graph G, whose nodes are enumerated from 1 to n. Notice the top-trading cycle 
     step is not implemented.
     
@@ -516,6 +612,8 @@ def updated_hybrid_max_matching(G, agent_cap=None):
         G (nx.Graph): Weighted bipartite Graph, with all edge weights assumed to be in [0,1].
         agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is equal to i. Defaults
         to len(G.nodes)//2 if not given.
+        need_ranks (bool): whether or not ranks still have to be assigned to the edges of G. Pass False if G has already been through rankify_graph,
+        e.g. by make_graph_ctx. Defaults to True.
 
     Returns:
         A set of 2-tuples representing a matching on G found by HybridMaxMatching.
@@ -524,7 +622,8 @@ def updated_hybrid_max_matching(G, agent_cap=None):
         agent_cap = len(G.nodes)//2    
 
     H = G.copy() # make a copy of graph with ranks; this'll be useful for later
-    H = rankify_graph(H, agent_cap)
+    if need_ranks:
+        H = rankify_graph(H, agent_cap)
     n = agent_cap
 
     for (u,v) in H.edges:
@@ -535,7 +634,7 @@ def updated_hybrid_max_matching(G, agent_cap=None):
         else:
             H[u][v]['weight'] = np.reciprocal(np.min([r, np.power(n, 1/3)])*np.power(n, 2/3)) if H[u][v]['weight'] >= np.reciprocal(np.min([r, np.power(n, 1/3)])*np.power(n, 2/3)) else 0
 
-    M_mm = nx.algorithms.matching.max_weight_matching(H)
+    M_mm = max_weight_matching(H)
 
     to_remove = []
     for (u,v) in M_mm:
@@ -545,14 +644,15 @@ def updated_hybrid_max_matching(G, agent_cap=None):
     M_mm = M_mm.difference(set(to_remove))
 
     I = G.copy()
-    I = rankify_graph(I, agent_cap)
+    if need_ranks:
+        I = rankify_graph(I, agent_cap)
 
     if len(M_mm) == 0:
         for (u,v) in I.edges:
             if I[u][v]['rank'] > np.floor(1/2 * np.power(n, 1/3)):
                 I.remove_edge(u,v)
 
-        M_aux = nx.algorithms.matching.max_weight_matching(I,maxcardinality=True) #compute a maximum cardinality matching
+        M_aux = max_weight_matching(I,maxcardinality=True) #compute a maximum cardinality matching
 
     else:
         for (u,v) in I.edges:
@@ -560,7 +660,7 @@ def updated_hybrid_max_matching(G, agent_cap=None):
                 I.remove_edge(u,v)
 
 
-        M_aux = nx.algorithms.matching.max_weight_matching(I,maxcardinality=True)
+        M_aux = max_weight_matching(I,maxcardinality=True)
 
     to_remove = []
     for (u,v) in M_aux:
@@ -584,30 +684,113 @@ def updated_hybrid_max_matching(G, agent_cap=None):
     return top_trading_cycles(G,agent_cap,match)
 
 
-def reassign_labels(G,M,agent_cap=None):
-    """Given a weighted bipartite Graph G and a matching M on G, where G is enumerated from 1 to n, returns a relabelled version of G such 
-    that each agent i gets good i + n//2. This primes the graph for the top trading cycle algorithm.
-    
+def to_weight_matrix(G, agent_cap=None):
+    """Converts a weighted bipartite Graph G into a dense biadjacency matrix, the inverse of InstanceGenerator.matrix_to_graph. Row i-1 holds
+    the edges of agent i, and column j-agent_cap-1 the edges of good j.
+
     Args:
-        G (nx.Graph): Weighted bipartite Graph, with all edge weights assumed to be in [0,1].
-        M (set of (int,int)): the matching that we are trying to relabel the Graph to.
+        G (nx.Graph): Weighted bipartite Graph with nodes named 1 through n. Agents are assumed to be nodes 1 through agent_cap.
         agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is 
         equal to i. Defaults to len(G.nodes)//2 if not given.
 
     Returns:
-        weighted bipartite Graph
+        Two-dimensional np.array of floats of shape (agent_cap, len(G.nodes)-agent_cap) holding the edge weights of G, with 0 where there is
+        no edge.
     """
     if agent_cap is None: # note in instances where nodes MUST be labelled 1...n, agent_cap=|agents|
         agent_cap = len(G.nodes)//2
 
-    li = list(M)
-    li = [(j, i + len(G.nodes)//2) if i < j else (i, j+len(G.nodes)//2) for (i,j) in li]
-    d = dict(li)
+    W = np.zeros((agent_cap, len(G.nodes)-agent_cap))
+    for u, v, weight in G.edges(data='weight'):
+        if u > v:
+            u, v = v, u
+        W[int(u)-1, int(v)-agent_cap-1] = weight
+    return W
+
+
+@dataclass
+class GraphCtx:
+    """Quantities of a Graph that don't depend on the algorithm being run, computed once so that every experiment on that Graph can share them.
+    Build with make_graph_ctx.
+
+    Attributes:
+        W (np.array): The dense biadjacency matrix of the Graph, as returned by to_weight_matrix.
+        opt_weight (float): The social welfare of a maximum weight matching of the Graph.
+    """
+    W: np.ndarray
+    opt_weight: float
+
+
+def make_graph_ctx(G, agent_cap=None):
+    """Ranks the edges of G in place and builds its GraphCtx. The ranks are assigned with rankify_graph, so that algorithms run on G afterwards
+    can be called with need_ranks=False.
+
+    Args:
+        G (nx.Graph): Weighted bipartite complete Graph with weights in [0,1], with nodes named 1 through n.
+        agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is 
+        equal to i. Defaults to len(G.nodes)//2 if not given.
+
+    Returns:
+        GraphCtx of G.
+    """
+    if agent_cap is None: # note in instances where nodes MUST be labelled 1...n, agent_cap=|agents|
+        agent_cap = len(G.nodes)//2
+
+    rankify_graph(G, agent_cap)
+    W = to_weight_matrix(G, agent_cap)
+
+    return GraphCtx(W, optimal_weight_dense(W))
+
+
+def matching_to_indices(M, agent_cap):
+    """Converts a matching on a Graph into row and column indices of the biadjacency matrix returned by to_weight_matrix.
+
+    Args:
+        M (set((nx.Node,nx.Node))): A set of 2-tuples, with each 2-tuple representing a pairing of an agent to a good.
+        agent_cap (int): The numerical label of the last agent.
+
+    Returns:
+        Two one-dimensional np.arrays of ints, holding the row (agent) and column (good) of each pair in M.
+    """
+    pairs = np.array([(a,b) if a < b else (b,a) for (a,b) in M], dtype=int)
+    return pairs[:,0] - 1, pairs[:,1] - agent_cap - 1
+
+
+def optimal_weight_dense(W):
+    """Finds the social welfare of a maximum weight matching of a weighted complete bipartite graph, given its dense biadjacency matrix.
 
-    return nx.relabel.relabel_nodes(G,d,True)
+    Args:
+        W (np.array): Dense biadjacency matrix of a weighted complete bipartite graph with weights in [0,1], as returned by to_weight_matrix.
+
+    Returns:
+        float total weight of a maximum weight matching.
+    """
+    opt_rows, opt_cols = linear_sum_assignment(W, maximize=True)
+    return W[opt_rows, opt_cols].sum()
 
 
-def calculate_distortion(G,M):
+def calculate_distortion_dense(W, M, opt_weight=None):
+    """Calculates the same ratio as calculate_distortion, using the dense biadjacency matrix of a complete bipartite graph instead of the graph itself.
+
+    Args:
+        W (np.array): Dense biadjacency matrix of a weighted complete bipartite graph with weights in [0,1], as returned by to_weight_matrix.
+        M (set((nx.Node,nx.Node))): A set of 2-tuples, with each 2-tuple representing a pairing of an agent to a good in the graph W was built from.
+        opt_weight (float): The social welfare of a maximum weight matching of the graph, if already known. Computed with optimal_weight_dense
+        if not given.
+
+    Returns:
+        A float value >= 1 representing the approximation ratio of the optimal social welfare to the social welfare generated by M.
+    """
+    if opt_weight is None:
+        opt_weight = optimal_weight_dense(W)
+
+    rows, cols = matching_to_indices(M, W.shape[0])
+    algo_weight = W[rows, cols].sum()
+
+    return opt_weight/algo_weight
+
+
+def calculate_distortion(G,M,ctx=None):
     """Calculates the approximation ratio of the social welfare of the optimal matching on weighted complete bipartite graph G versus the social welfare
     accrued by the given matching M. Notice that this is not actually the definition of distortion, as we are not taking a supremum over all possible
     valuations.
@@ -615,17 +798,22 @@ def calculate_distortion(G,M):
     Args:
         G (nx.Graph): Weighted bipartite complete Graph with weights in [0,1].
         M (set((nx.Node,nx.Node))): A set of 2-tuples, with each 2-tuple representing a pairing of an agent in G to a good in G. 
+        ctx (GraphCtx): The GraphCtx of G, as returned by make_graph_ctx. If given, the distortion is computed with calculate_distortion_dense
+        instead, reusing the optimal welfare stored in ctx.
 
     Returns:
         A float value >= 1 representing the approximation ratio of the optimal social welfare to the social welfare generated by M. 
     """
+    if ctx is not None:
+        return calculate_distortion_dense(ctx.W, M, ctx.opt_weight)
+
     algo_weight = sum([G[u][v]['weight'] for (u,v) in M])
-    opt_weight = sum([G[u][v]['weight'] for (u,v) in nx.algorithms.matching.max_weight_matching(G)])
+    opt_weight = sum([G[u][v]['weight'] for (u,v) in max_weight_matching(G)])
 
     return opt_weight/algo_weight
 
 
-def calculate_modified_distortion(G,M,prio='rank_maximal'):
+def calculate_modified_distortion(G,M,prio='rank_maximal',agent_cap=None,ctx=None):
     """Calculates the approximation of social welfare among allocations that satisfy the criterion prio by finding the social welfare of the
     optimal matching on weighted complete bipartite graph G subject to the criterion, then dividing it by the social welfare achieved by given
     matching M.
@@ -635,14 +823,37 @@ def calculate_modified_distortion(G,M,prio='rank_maximal'):
         M (set((nx.Node,nx.Node))): A set of 2-tuples, with each 2-tuple representing a pairing of an agent in G to a good in G.
         prio (String): A string from the list ['rank_maximal', 'max_cardinality_rank_maximal', 'fair'] which specifies which criterion we want to
         enforce on the matching.
+        agent_cap (int): The numerical label of the last agent; that is, if agents are enumerated by nodes 1 through i, then agent_cap is equal to i. Defaults
+        to len(G.nodes)//2 if not given.
+        ctx (GraphCtx): The GraphCtx of G, as returned by make_graph_ctx. If given and prio is 'pareto', which leaves the weights of G unchanged,
+        the distortion is computed with calculate_distortion_dense instead, reusing the optimal welfare stored in ctx. Otherwise the ranks
+        already assigned to G are reused.
 
     Returns:
         A float value representing the approximation ratio of the optimal social welfare to the social welfare generated by M. 
     """
-    H = priority_augment(G, prio)
-    max_weight_match = nx.algorithms.matching.max_weight_matching(H)
+    if ctx is not None and prio == 'pareto':
+        return calculate_distortion_dense(ctx.W, M, ctx.opt_weight)
+
+    H = priority_augment(G, prio, agent_cap, ctx is None)
+    max_weight_match = max_weight_matching(H)
 
     algo_weight = sum([G[u][v]['weight'] for (u,v) in M])
     opt_weight = sum([G[u][v]['weight'] for (u,v) in max_weight_match])
 
-    return opt_weight/algo_weight
\ No newline at end of file
+    return opt_weight/algo_weight
+
+
+def calculate_modified_distortion_pareto(G,M,ctx=None):
+    """Calculates calculate_modified_distortion(G, M, 'pareto'). Augmenting G for pareto optimality leaves its weights unchanged, so this skips
+    priority_augment and returns the plain distortion from calculate_distortion.
+
+    Args:
+        G (nx.Graph): Weighted bipartite complete Graph with weights in [0,1].
+        M (set((nx.Node,nx.Node))): A set of 2-tuples, with each 2-tuple representing a pairing of an agent in G to a good in G.
+        ctx (GraphCtx): The GraphCtx of G, as returned by make_graph_ctx. If given, used to speed up the calculation.
+
+    Returns:
+        A float value representing the approximation ratio of the optimal social welfare to the social welfare generated by M.
+    """
+    return calculate_distortion(G, M, ctx)
@@ -1,6 +1,7 @@
 "Module containing utility classes and functions."
 
 import numpy as np
+import pandas as pd
 
 def unpack_r_data(s, n, k):
     """Unpacks an R data file containing a list of k matrices, each one representing the ordinal preferences of n agents over n goods. 
@@ -14,5 +15,5 @@ def unpack_r_data(s, n, k):
     Returns:
         three-dimensional np.array of integers where each row contains all values from 1 to n representing a list of agent ordinal preferences.
     """
-    a = np.loadtxt(s, delimiter = ",")
+    a = pd.read_csv(s, header=None, dtype=np.int16, engine="c").to_numpy()
     return np.reshape(a, (k,n,n))
\ No newline at end of file